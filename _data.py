@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from statsmodels.tsa.arima.model import ARIMA
+
+# Data loading and aggregation shared by the dashboard pages. Cached results are
+# keyed on these functions, so every page importing them reuses the same entries.
+
+# Load the preprocessed data (see convert_data.py), with the campaign tiers as categoricals
+@st.cache_data
+def load_data():
+    return pd.read_parquet('cleaned_data.parquet', engine='pyarrow', read_dictionary=['Tier 4', 'Tier 5'])
+
+# Aggregate campaign metrics, indexed by campaign, and their correlations
+@st.cache_data
+def compute_campaign(df: pd.DataFrame, tier_column: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Aggregate data by campaign and derive CPA/Revenue in one eval pass
+    campaign_data = df.groupby(tier_column, sort=False, observed=True).agg(**{
+        'Spend': ('Spend', 'sum'),
+        'RB Conv': ('RB Conv', 'sum'),
+        'RB CPO': ('RB CPO', 'mean'),
+        'AOV': ('AOV', 'mean'),
+        'ROAS': ('ROAS', 'mean')
+    })
+    campaign_data.eval('''
+    CPA = Spend / `RB Conv`
+    Revenue = Spend * ROAS
+    ''', inplace=True)
+
+    corr = campaign_data[['Spend', 'RB Conv', 'RB CPO', 'AOV', 'ROAS', 'CPA', 'Revenue']].corr()
+    return campaign_data, corr
+
+# Aggregate data by week (indexed by week), kept sorted since the CSV weeks are not in date order
+@st.cache_data
+def compute_weekly(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby('Week', observed=True).agg({
+        'Spend': 'sum',
+        'RB Conv': 'sum',
+        'RB CPO': 'mean',
+        'AOV': 'mean',
+        'ROAS': 'mean'
+    })
+
+# Fit ARIMA on the weekly series; the fitted results are kept in memory, not pickled
+@st.cache_resource
+def get_arima_results(values: np.ndarray, index: np.ndarray, order=(1, 1, 1)):
+    series = pd.Series(values, index=pd.DatetimeIndex(index))
+    return ARIMA(series, order=order).fit()
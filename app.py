@@ -1,23 +1,61 @@
+import os
+
+# Opt-in for multi-tenant deployments: set DASHBOARD_CONCURRENCY to the expected number
+# of concurrent sessions to cap NumExpr at cores / sessions threads, so each eval doesn't
+# claim every core. Must happen before pandas imports numexpr. Unset (the default) leaves
+# NumExpr's own thread defaults, as does a value that is not an integer; explicit
+# NUMEXPR_* variables always take precedence.
+try:
+    concurrency = max(1, int(os.environ.get('DASHBOARD_CONCURRENCY', '')))
+except ValueError:
+    concurrency = None
+if concurrency is not None:
+    thread_cap = str(max(1, (os.cpu_count() or 1) // concurrency))
+    os.environ.setdefault('NUMEXPR_MAX_THREADS', thread_cap)
+    os.environ.setdefault('NUMEXPR_NUM_THREADS', thread_cap)
+
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from plotly_resampler import FigureResampler
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
 from statsmodels.tsa.seasonal import seasonal_decompose
-from statsmodels.tsa.arima.model import ARIMA
+
+from _data import load_data, compute_campaign, compute_weekly, get_arima_results
+
+# Client-side number formats for the campaign grid
+MONEY_FORMATTER = JsCode("""function(params) {
+    if (params.value == null) return '';
+    return '$' + Number(params.value).toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+}""")
+NUMBER_FORMATTER = JsCode("""function(params) {
+    if (params.value == null) return '';
+    return Number(params.value).toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+}""")
+GRID_FORMATTERS = {
+    'Spend': MONEY_FORMATTER,
+    'RB Conv': NUMBER_FORMATTER,
+    'RB CPO': MONEY_FORMATTER,
+    'AOV': MONEY_FORMATTER,
+    'ROAS': NUMBER_FORMATTER,
+    'CPA': MONEY_FORMATTER,
+    'Revenue': MONEY_FORMATTER
+}
+
+# Number formats for the weekly performance table
+WEEK_FORMAT = {
+    'Spend': '${:,.2f}',
+    'RB Conv': '{:,.2f}',
+    'RB CPO': '${:,.2f}',
+    'AOV': '${:,.2f}',
+    'ROAS': '{:,.2f}'
+}
 
 # Set page to wide mode
 st.set_page_config(layout="wide")
 
-# Load and preprocess the data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('cleaned_data.csv')
-    df['Week'] = pd.to_datetime(df['Week'].str.split('-').str[0])
-    numeric_columns = ['ROAS', 'Spend', 'RB Conv', 'RB CPO', 'AOV']
-    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
-    return df
-
 df = load_data()
 
 # Streamlit app
@@ -28,43 +66,30 @@ tab1, tab2, tab3, tab4 = st.tabs(["Tier 4 Analysis", "Tier 5 Analysis", "Time Se
 
 # Function to create campaign analysis
 def campaign_analysis(df, tier_column):
-    # Aggregate data by campaign
-    campaign_data = df.groupby(tier_column).agg({
-        'Spend': 'sum',
-        'RB Conv': 'sum',
-        'RB CPO': 'mean',
-        'AOV': 'mean',
-        'ROAS': 'mean'
-    }).reset_index()
-    
-    # Calculate additional metrics
-    campaign_data['CPA'] = campaign_data['Spend'] / campaign_data['RB Conv']
-    campaign_data['Revenue'] = campaign_data['Spend'] * campaign_data['ROAS']
-    
+    campaign_data, corr = compute_campaign(df, tier_column)
+
     # Display campaign performance table
     st.subheader(f'{tier_column} Campaign Performance')
-    st.dataframe(campaign_data.sort_values('ROAS', ascending=False).style.format({
-        'Spend': '${:,.2f}',
-        'RB Conv': '{:,.2f}',
-        'RB CPO': '${:,.2f}',
-        'AOV': '${:,.2f}',
-        'ROAS': '{:,.2f}',
-        'CPA': '${:,.2f}',
-        'Revenue': '${:,.2f}'
-    }), use_container_width=True)
+    table = campaign_data.sort_values('ROAS', ascending=False).reset_index()
+    gb = GridOptionsBuilder.from_dataframe(table)
+    for column, formatter in GRID_FORMATTERS.items():
+        gb.configure_column(column, valueFormatter=formatter)
+    AgGrid(table, gridOptions=gb.build(), update_mode=GridUpdateMode.NO_UPDATE, update_on=[],
+           allow_unsafe_jscode=True, key=f'grid-{tier_column}')
 
     # Visualizations
     st.subheader('Campaign Visualizations')
 
     # Scatter plot of Spend vs Conversions
-    fig = px.scatter(campaign_data.dropna(subset=['ROAS']), x='Spend', y='RB Conv', size='ROAS', color='ROAS',
-                     hover_name=tier_column, log_x=True, size_max=60,
+    scatter_data = campaign_data.dropna(subset=['ROAS'])
+    fig = px.scatter(scatter_data, x='Spend', y='RB Conv', size='ROAS', color='ROAS',
+                     hover_name=scatter_data.index, log_x=True, size_max=60,
                      labels={'Spend': 'Total Spend ($)', 'RB Conv': 'Total Conversions', 'ROAS': 'ROAS'},
                      title=f'Spend vs Conversions (Size/Color = ROAS) for {tier_column}')
     st.plotly_chart(fig, use_container_width=True)
 
     # Bar plot of ROAS by Campaign
-    top_campaigns = campaign_data.sort_values('ROAS', ascending=False).head(10)
+    top_campaigns = campaign_data.sort_values('ROAS', ascending=False).head(10).reset_index()
     fig = px.bar(top_campaigns, x=tier_column, y='ROAS', color='Spend',
                  labels={'ROAS': 'Return on Ad Spend', 'Spend': 'Total Spend ($)'},
                  title=f'Top 10 Campaigns by ROAS for {tier_column}')
@@ -72,7 +97,6 @@ def campaign_analysis(df, tier_column):
     st.plotly_chart(fig, use_container_width=True)
 
     # Correlation heatmap
-    corr = campaign_data[['Spend', 'RB Conv', 'RB CPO', 'AOV', 'ROAS', 'CPA', 'Revenue']].corr()
     fig = px.imshow(corr, text_auto=True, aspect="auto",
                     title=f'Correlation Heatmap of Metrics for {tier_column}')
     st.plotly_chart(fig, use_container_width=True)
@@ -91,20 +115,15 @@ with tab2:
 with tab3:
     st.subheader('Time Series Analysis')
     
-    # Aggregate data by week
-    time_df = df.groupby('Week').agg({
-        'Spend': 'sum',
-        'RB Conv': 'sum',
-        'RB CPO': 'mean',
-        'AOV': 'mean',
-        'ROAS': 'mean'
-    }).reset_index()
+    time_df = compute_weekly(df)
+    weeks = time_df.index.to_numpy()
+    metric_arrs = {m: time_df[m].to_numpy(dtype=np.float32) for m in ['Spend', 'RB Conv', 'RB CPO', 'AOV', 'ROAS']}
     
-    # Line plot for all metrics over time
-    fig = go.Figure()
+    # Line plot for all metrics over time, downsampled before it is sent to the browser
+    fig = FigureResampler(go.Figure())
     
-    for metric in ['Spend', 'RB Conv', 'RB CPO', 'AOV', 'ROAS']:
-        fig.add_trace(go.Scatter(x=time_df['Week'], y=time_df[metric], name=metric, visible='legendonly' if metric != 'ROAS' else True))
+    for metric, values in metric_arrs.items():
+        fig.add_trace(go.Scatter(x=weeks, y=values, name=metric, visible='legendonly' if metric != 'ROAS' else True))
     
     fig.update_layout(title_text='Metrics Over Time', height=600)
     fig.update_xaxes(title_text='Week')
@@ -113,25 +132,18 @@ with tab3:
     
     # Weekly performance table
     st.subheader('Weekly Performance')
-    st.dataframe(time_df.style.format({
-        'Spend': '${:,.2f}',
-        'RB Conv': '{:,.2f}',
-        'RB CPO': '${:,.2f}',
-        'AOV': '${:,.2f}',
-        'ROAS': '{:,.2f}'
-    }), use_container_width=True)
+    st.dataframe(time_df.style.format(WEEK_FORMAT), use_container_width=True)
 
 
-    roas_series = time_df.set_index('Week')['ROAS']
-    # ARIMA forecast
+    # ARIMA forecast, fitted on float64 ROAS (float32 input degenerates to a flat forecast)
     st.subheader('ROAS Forecast')
-    model = ARIMA(roas_series, order=(1,1,1))
-    results = model.fit()
-    forecast = results.forecast(steps=4)
+    roas_values = time_df['ROAS'].to_numpy(dtype=np.float64)
+    forecast = get_arima_results(roas_values, weeks).forecast(steps=4)
+    fc_idx, fc_vals = forecast.index.to_numpy(), forecast.to_numpy()
     
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=roas_series.index, y=roas_series.values, name='Historical ROAS'))
-    fig.add_trace(go.Scatter(x=forecast.index, y=forecast.values, name='Forecasted ROAS', line=dict(dash='dash')))
+    fig = FigureResampler(go.Figure())
+    fig.add_trace(go.Scatter(x=weeks, y=metric_arrs['ROAS'], name='Historical ROAS'))
+    fig.add_trace(go.Scatter(x=fc_idx, y=fc_vals, name='Forecasted ROAS', line=dict(dash='dash')))
     fig.update_layout(title='ROAS Forecast for Next 4 Weeks', xaxis_title='Week', yaxis_title='ROAS')
     st.plotly_chart(fig, use_container_width=True)
 
@@ -141,22 +153,22 @@ with tab4:
 
     # Tier 4 Insights
     st.subheader('Tier 4 Campaign Insights')
-    top_tier4 = tier4_data.loc[tier4_data['ROAS'].idxmax()]
-    worst_tier4 = tier4_data.loc[tier4_data['ROAS'].idxmin()]
-    highest_spend_tier4 = tier4_data.loc[tier4_data['Spend'].idxmax()]
+    top_tier4 = tier4_data.nlargest(1, 'ROAS').iloc[0]
+    worst_tier4 = tier4_data.nsmallest(1, 'ROAS').iloc[0]
+    highest_spend_tier4 = tier4_data.nlargest(1, 'Spend').iloc[0]
     
     st.write(f"""
-    1. Best Performing Tier 4 Campaign: '{top_tier4['Tier 4']}' 
+    1. Best Performing Tier 4 Campaign: '{top_tier4.name}' 
        - ROAS: {top_tier4['ROAS']:.2f}
        - Revenue: ${top_tier4['Revenue']:,.2f}
        - Spend: ${top_tier4['Spend']:,.2f}
     
-    2. Underperforming Tier 4 Campaign: '{worst_tier4['Tier 4']}'
+    2. Underperforming Tier 4 Campaign: '{worst_tier4.name}'
        - ROAS: {worst_tier4['ROAS']:.2f}
        - Revenue: ${worst_tier4['Revenue']:,.2f}
        - Spend: ${worst_tier4['Spend']:,.2f}
     
-    3. Highest Spend Tier 4 Campaign: '{highest_spend_tier4['Tier 4']}'
+    3. Highest Spend Tier 4 Campaign: '{highest_spend_tier4.name}'
        - Spend: ${highest_spend_tier4['Spend']:,.2f}
        - ROAS: {highest_spend_tier4['ROAS']:.2f}
        - Revenue: ${highest_spend_tier4['Revenue']:,.2f}
@@ -168,22 +180,22 @@ with tab4:
 
     # Tier 5 Insights
     st.subheader('Tier 5 Campaign Insights')
-    top_tier5 = tier5_data.loc[tier5_data['ROAS'].idxmax()]
-    worst_tier5 = tier5_data.loc[tier5_data['ROAS'].idxmin()]
-    highest_spend_tier5 = tier5_data.loc[tier5_data['Spend'].idxmax()]
+    top_tier5 = tier5_data.nlargest(1, 'ROAS').iloc[0]
+    worst_tier5 = tier5_data.nsmallest(1, 'ROAS').iloc[0]
+    highest_spend_tier5 = tier5_data.nlargest(1, 'Spend').iloc[0]
     
     st.write(f"""
-    1. Best Performing Tier 5 Campaign: '{top_tier5['Tier 5']}' 
+    1. Best Performing Tier 5 Campaign: '{top_tier5.name}' 
        - ROAS: {top_tier5['ROAS']:.2f}
        - Revenue: ${top_tier5['Revenue']:,.2f}
        - Spend: ${top_tier5['Spend']:,.2f}
     
-    2. Underperforming Tier 5 Campaign: '{worst_tier5['Tier 5']}'
+    2. Underperforming Tier 5 Campaign: '{worst_tier5.name}'
        - ROAS: {worst_tier5['ROAS']:.2f}
        - Revenue: ${worst_tier5['Revenue']:,.2f}
        - Spend: ${worst_tier5['Spend']:,.2f}
     
-    3. Highest Spend Tier 5 Campaign: '{highest_spend_tier5['Tier 5']}'
+    3. Highest Spend Tier 5 Campaign: '{highest_spend_tier5.name}'
        - Spend: ${highest_spend_tier5['Spend']:,.2f}
        - ROAS: {highest_spend_tier5['ROAS']:.2f}
        - Revenue: ${highest_spend_tier5['Revenue']:,.2f}
@@ -195,18 +207,18 @@ with tab4:
 
     # Time Series Insights
     st.subheader('Time Series Insights')
-    best_week = time_df.loc[time_df['ROAS'].idxmax()]
-    worst_week = time_df.loc[time_df['ROAS'].idxmin()]
-    spend_trend = 'increasing' if time_df['Spend'].iloc[-1] > time_df['Spend'].iloc[0] else 'decreasing'
-    roas_trend = 'improving' if time_df['ROAS'].iloc[-1] > time_df['ROAS'].iloc[0] else 'declining'
+    best_week = time_df.nlargest(1, 'ROAS').iloc[0]
+    worst_week = time_df.nsmallest(1, 'ROAS').iloc[0]
+    spend_trend = 'increasing' if metric_arrs['Spend'][-1] > metric_arrs['Spend'][0] else 'decreasing'
+    roas_trend = 'improving' if metric_arrs['ROAS'][-1] > metric_arrs['ROAS'][0] else 'declining'
     
     st.write(f"""
-    1. Best Performing Week: {best_week['Week'].date()}
+    1. Best Performing Week: {best_week.name.date()}
        - ROAS: {best_week['ROAS']:.2f}
        - Spend: ${best_week['Spend']:,.2f}
        - Conversions: {best_week['RB Conv']:.0f}
     
-    2. Worst Performing Week: {worst_week['Week'].date()}
+    2. Worst Performing Week: {worst_week.name.date()}
        - ROAS: {worst_week['ROAS']:.2f}
        - Spend: ${worst_week['Spend']:,.2f}
        - Conversions: {worst_week['RB Conv']:.0f}
@@ -216,7 +228,7 @@ with tab4:
        - ROAS is {roas_trend} over the analyzed period
 
            
-    4. Forecast: The ARIMA model predicts a {'rising' if forecast.values[-1] > roas_series.iloc[-1] else 'falling'} trend in ROAS for the next 4 weeks.
+    4. Forecast: The ARIMA model predicts a {'rising' if fc_vals[-1] > roas_values[-1] else 'falling'} trend in ROAS for the next 4 weeks.
     """)
 
     st.subheader('Recommendations')
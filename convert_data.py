@@ -0,0 +1,16 @@
+import polars as pl
+
+# One-off conversion of cleaned_data.csv to a typed, compressed Parquet file
+# that app.py loads without any CSV parsing. Re-run after updating the CSV:
+#   python convert_data.py
+# float32 is plenty for the summed/averaged spend and conversion metrics. ROAS stays
+# float64: the ARIMA forecast degenerates to a flat line on float32-rounded ROAS.
+schema = {c: pl.Float32 for c in ['Spend', 'RB Conv', 'RB CPO', 'AOV']}
+schema['ROAS'] = pl.Float64
+
+df = pl.read_csv('cleaned_data.csv', try_parse_dates=False,
+                 schema_overrides=schema,
+                 null_values=['', 'NaN', 'nan', 'N/A', '#DIV/0!'])
+# Keep the start of the 'M/D/YY-M/D/YY' range as a timestamp column
+df = df.with_columns(pl.col('Week').str.extract(r'^([^-]+)').str.to_date('%m/%d/%y').cast(pl.Datetime('ms')))
+df.write_parquet('cleaned_data.parquet', compression='zstd')